@@ -21,13 +21,17 @@ import logging
 from pathlib import Path
 from typing import List
 
+import ijson
 import numpy as np
+import orjson
 import pandas as pd
 import requests
+from requests_cache import CachedSession
 
-import nflnames
 from nflprojections import ProjectionSource
 
+from espnprojections import utils
+
 
 class Scraper:
     """
@@ -35,10 +39,27 @@ class Scraper:
 
     """
 
-    def __init__(self, season):
-        """Creates Scraper instance"""
+    def __init__(self, season, timeout=30, expire_after=3600, cache_name='espn_http_cache', backend='sqlite'):
+        """Creates Scraper instance
+
+        Args:
+            season (int): the season, e.g. 2021
+            timeout (int): seconds to wait for the API to respond
+            expire_after (int): seconds to reuse a cached response
+            cache_name (str): cache name, relative names go in the user cache directory
+            backend (str): requests_cache backend, e.g. 'sqlite' or 'memory'
+
+        """
         self.season = season
-        self._s = requests.Session()
+        self.timeout = timeout
+        self._s = CachedSession(
+            cache_name,
+            backend=backend,
+            use_cache_dir=True,
+            expire_after=expire_after,
+            cache_control=True
+        )
+        self._s.headers.update(self.default_headers)
 
     @property
     def api_url(self) -> str:
@@ -82,12 +103,30 @@ class Scraper:
 
     def get_json(self, url, headers: dict = None, params: dict = None) -> dict:
         """Gets json response"""
-        r = self._s.get(url, headers=headers, params=params)
-        return r.json()
+        r = self._s.get(url, headers=headers, params=params, timeout=self.timeout)
+        return orjson.loads(r.content)
+
+    def get_stream(self, url, headers: dict = None, params: dict = None) -> requests.Response:
+        """Gets response without reading the body, for incremental parsing"""
+        return self._s.get(url, headers=headers, params=params, timeout=self.timeout, stream=True)
 
     def projections(self) -> dict:
         """Gets all ESPN player projections """
-        return self.get_json(self.api_url, headers=self.default_headers, params=self.default_params)
+        return self.get_json(self.api_url, params=self.default_params)
+
+    def refresh(self):
+        """Removes the cached projections so the next request gets fresh data"""
+        request = requests.Request('GET', self.api_url, params=self.default_params).prepare()
+        self._s.cache.delete(requests=[request])
+
+    def projections_stream(self) -> requests.Response:
+        """Gets all ESPN player projections as a streaming response
+
+        The cache reads the whole body to save it, so only parsing is
+        incremental, the download is still held in memory once.
+
+        """
+        return self.get_stream(self.api_url, params=self.default_params)
 
 
 class Parser:
@@ -194,6 +233,17 @@ class Parser:
 
     TEAM_ID_MAP = {v: k for k, v in TEAM_MAP.items()}
 
+    # id-indexed arrays to translate whole id columns at once
+    _POSITION_BY_ID = np.array(list(map(POSITION_MAP.get, range(max(POSITION_MAP) + 1))), dtype=object)
+    _TEAM_BY_ID = np.array(list(map(TEAM_ID_MAP.get, range(max(TEAM_ID_MAP) + 1))), dtype=object)
+
+    PLAYER_COLUMNS = {
+        "id": "source_player_id",
+        "fullName": "source_player_name",
+        "proTeamId": "source_team_id",
+        "defaultPositionId": "source_player_position",
+    }
+
     def __init__(self, season, week):
         """
             """
@@ -202,24 +252,23 @@ class Parser:
 
     def _find_projection(self, stats: List[dict]) -> dict:
         """Simplified way to find projection or result"""
-        mapping = {
-            "seasonId": self.season,
-            "scoringPeriodId": self.week,
-            "statSourceId": 1,
-            "statSplitTypeId": 0
-        }
+        season, week = self.season, self.week
 
+        # scoringPeriodId is most selective, so check it first
         for item in stats:
-            if {k: item[k] for k in mapping} == mapping:
+            if (
+                item["scoringPeriodId"] == week
+                and item["statSourceId"] == 1
+                and item["statSplitTypeId"] == 0
+                and item["seasonId"] == season
+            ):
                 return item
 
-    def _parse_stats(self, stat: dict) -> dict:
-        """Parses stats dict"""
-        return {
-            self.STAT_MAP.get(str(k)): float(v)
-            for k, v in stat.items()
-            if str(k) in self.STAT_MAP
-        }
+    def _player_record(self, player: dict) -> dict:
+        """Keeps the player columns and the matching projection stat line"""
+        record = {k: player.get(k) for k in self.PLAYER_COLUMNS}
+        record["stats"] = self._find_projection(player.get("stats", []))
+        return record
 
     def espn_team(self, team_code: str = None, team_id: int = None) -> str:
         """Returns team_id given code or team_code given team_id"""
@@ -227,6 +276,55 @@ class Parser:
             return self.TEAM_MAP.get(team_code)
         return self.TEAM_ID_MAP.get(int(team_id))
 
+    @staticmethod
+    def _lookup(table: np.ndarray, ids: pd.Series) -> np.ndarray:
+        """Translates a column of ids with an id-indexed array, None if unknown"""
+        ids = ids.fillna(0).to_numpy(dtype=int)
+        known = (ids >= 0) & (ids < len(table))
+        return np.where(known, table[np.where(known, ids, 0)], None)
+
+    def _records_frame(self, records) -> pd.DataFrame:
+        """Builds one row per player with the matching projection stats
+
+        Args:
+            records(iterable): of dict from _player_record
+
+        Returns:
+            pd.DataFrame
+
+        """
+        records = list(records)
+        df = (
+            pd.DataFrame(records, columns=list(self.PLAYER_COLUMNS))
+            .rename(columns=self.PLAYER_COLUMNS)
+        )
+        df["source_team_code"] = self._lookup(self._TEAM_BY_ID, df["source_team_id"])
+        df["source_player_position"] = self._lookup(self._POSITION_BY_ID, df["source_player_position"])
+
+        # expand all stats dicts at once
+        found = [record["stats"] for record in records]
+        df["source_player_projection"] = [stat["appliedTotal"] if stat else None for stat in found]
+        stats = pd.DataFrame(
+            [stat["stats"] if stat else {} for stat in found],
+            index=df.index,
+            columns=list(self.STAT_MAP),
+            dtype=float
+        )
+        stats.columns = stats.columns.map(self.STAT_MAP)
+        return pd.concat([df, stats], axis=1)
+
+    def _projections_frame(self, content: dict) -> pd.DataFrame:
+        """Builds one row per player with the matching projection stats
+
+        Args:
+            content(dict): parsed JSON
+
+        Returns:
+            pd.DataFrame
+
+        """
+        return self._records_frame(self._player_record(item["player"]) for item in content["players"])
+
     def projections(self, content: dict) -> List[dict]:
         """Parses the seasonal projections
         
@@ -237,75 +335,53 @@ class Parser:
             list: of dict
 
         """
-        proj = []
-
-        top_level_keys = {
-            "id": "source_player_id",
-            "fullName": "source_player_name",
-            "proTeamId": "source_team_id",
-        }
+        return self._projections_frame(content).to_dict(orient="records")
 
-        for player in [item["player"] for item in content["players"]]:
-            p = {
-                top_level_keys.get(k): v
-                for k, v in player.items()
-                if k in top_level_keys
-            }
-
-            p["source_team_code"] = self.espn_team(team_id=p.get("source_team_id", 0))
-            p['source_player_position'] = self.POSITION_MAP.get(int(player['defaultPositionId']))
-
-            # loop through player stats to find projections
-            stat = self._find_projection(player["stats"])
-            if stat:
-                p["source_player_projection"] = stat["appliedTotal"]
-                proj.append(dict(**p, **self._parse_stats(stat["stats"])))
-            else:
-                p["source_player_projection"] = None
-                proj.append(p)
-        return proj
-
-    def weekly_projections(self, content: dict) -> List[dict]:
+    def weekly_projections(self, content: dict) -> pd.DataFrame:
         """Parses the weekly projections
 
         Args:
             content(dict): parsed JSON
-            week(int): 1-17
 
         Returns:
-            list: of dict
+            pd.DataFrame
         """
-        proj = []
+        df = self._projections_frame(content)
+        df["source_player_position"] = df["source_player_position"].fillna("UNK")
+        return df
 
-        top_level_keys = {
-            "id": "source_player_id",
-            "fullName": "source_player_name",
-            "proTeamId": "source_team_id",
-            "defaultPositionId": "source_player_position"
-        }
+    def iter_projections(self, response: requests.Response):
+        """Parses players one at a time from a streaming response
 
-        for player in [item["player"] for item in content["players"]]:
-            p = {
-                top_level_keys.get(k): v
-                for k, v in player.items()
-                if k in top_level_keys
-            }
+        Args:
+            response(requests.Response): from Scraper.projections_stream
 
-            p["source_team_code"] = self.espn_team(team_id=p.get("source_team_id", 0))
-            p["source_player_position"] = self.POSITION_MAP.get(p["source_player_position"], "UNK")
+        Yields:
+            dict: player columns and matching projection stat line, see _player_record
 
-            # loop through player stats to find weekly projections
-            try:
-                stat = self._find_projection(player["stats"])
-                if stat:
-                    p["source_player_projection"] = stat["appliedTotal"]
-                    proj.append(dict(**p, **self._parse_stats(stat["stats"])))
-                else:
-                    p["source_player_projection"] = None
-                    proj.append(p)
-            except KeyError:
-                proj.append(p)
-        return pd.DataFrame(proj)
+        """
+        # push chunks into ijson, which also works for cached responses
+        players = ijson.sendable_list()
+        coro = ijson.items_coro(players, "players.item.player", use_float=True)
+        for chunk in response.iter_content(chunk_size=65536):
+            coro.send(chunk)
+            yield from map(self._player_record, players)
+            del players[:]
+        coro.close()
+        yield from map(self._player_record, players)
+
+    def stream_projections(self, response: requests.Response) -> pd.DataFrame:
+        """Parses the weekly projections without decoding the whole payload
+
+        Args:
+            response(requests.Response): from Scraper.projections_stream
+
+        Returns:
+            pd.DataFrame
+        """
+        df = self._records_frame(self.iter_projections(response))
+        df["source_player_position"] = df["source_player_position"].fillna("UNK")
+        return df
 
 
 class ESPNProjections(ProjectionSource):
@@ -318,11 +394,19 @@ class ESPNProjections(ProjectionSource):
         'source_player_name': 'plyr'
     }
 
-    def __init__(self, **kwargs):
-        """Creates object"""
+    def __init__(self, cache_name='espn_http_cache', backend='sqlite', **kwargs):
+        """Creates object
+
+        Args:
+            cache_name (str): HTTP cache name, passed to Scraper
+            backend (str): HTTP cache backend, passed to Scraper
+
+        """
         kwargs['column_mapping'] = self.COLUMN_MAPPING
         kwargs['projections_name'] = 'espn'
         super().__init__(**kwargs)
+        self.cache_name = cache_name
+        self.backend = backend
 
     def load_raw(self, season: int, week: int) -> pd.DataFrame:
         """Loads raw projections
@@ -335,10 +419,10 @@ class ESPNProjections(ProjectionSource):
             pd.DataFrame
 
         """
-        s = Scraper(season=season)
+        s = Scraper(season=season, cache_name=self.cache_name, backend=self.backend)
         p = Parser(season=season, week=week)
-        data = p.weekly_projections(s.projections())
-        return pd.DataFrame(data)
+        with s.projections_stream() as r:
+            return p.stream_projections(r)
 
     def process_raw(self, df):
         """Processes raw dataframe"""
@@ -347,9 +431,11 @@ class ESPNProjections(ProjectionSource):
                   'source_player_id',
                   'source_team_code', 
                   'source_player_projection']
-        df = df.loc[:, wanted]
-        df.columns = self.remap_columns(df.columns)
-        return df
+        return (
+            df.rename(columns=self.COLUMN_MAPPING)
+            .reindex(columns=self.remap_columns(wanted))
+            .astype({'pos': 'category', 'team': 'category'})
+        )
 
     def standardize(self, df):
         """Standardizes names/teams/positions
@@ -362,7 +448,9 @@ class ESPNProjections(ProjectionSource):
 
         """
         # standardize team and opp
-        df = df.assign(team=self.standardize_teams(df.team.str.replace('WSH', 'WAS')))
+        # map renames each category once, and also handles frames read back with plain strings
+        team = df.team.astype('category').map(lambda t: 'WAS' if t == 'WSH' else t)
+        df = df.assign(team=self.standardize_teams(team))
 
         # standardize positions
         df = df.assign(pos=self.standardize_positions(df.pos))
@@ -381,8 +469,4 @@ class ESPNProjections(ProjectionSource):
             pd.Series
 
         """
-        # different approach for defenses
-        # different rules for defense and players
-        return pd.Series(np.where(df.pos == 'DST', 
-                     df.team.str.lower() + ' defense', 
-                     df.plyr.apply(nflnames.standardize_player_name)))
+        return utils.standardize_players(df)
@@ -0,0 +1,36 @@
+"""
+utils.py
+helpers shared by the espn and watson projection sources
+
+"""
+
+from functools import lru_cache
+
+import nflnames
+import numpy as np
+import pandas as pd
+
+
+# names repeat across sources and weeks, so one cache serves both
+standardize_player_name = lru_cache(maxsize=16384)(nflnames.standardize_player_name)
+
+
+def standardize_players(df: pd.DataFrame) -> pd.Series:
+    """Standardizes player names, defenses are named after their team
+
+    Args:
+        df (pd.DataFrame): projections with plyr, team and pos columns
+
+    Returns:
+        pd.Series
+
+    """
+    # different rules for defense and players
+    names = df.plyr.unique()
+    cleaned = df.plyr.map(dict(zip(names, map(standardize_player_name, names))))
+
+    # build defense names once per team, missing teams (code -1) get the trailing nan
+    team = df.team.astype('category')
+    defenses = np.append((team.cat.categories.str.lower() + ' defense').to_numpy(dtype=object), np.nan)
+    defenses = defenses[team.cat.codes.to_numpy()]
+    return pd.Series(np.where(df.pos == 'DST', defenses, cleaned), index=df.index)
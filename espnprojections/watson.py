@@ -1,14 +1,24 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import logging
+from operator import itemgetter
 
 import browser_cookie3
 import numpy as np
+import orjson
 import pandas as pd
 from requests_cache import CachedSession
 
-import nflnames
 from nflprojections import ProjectionSource
 
+from espnprojections import utils
+
+
+@lru_cache(maxsize=1)
+def _firefox_cookies():
+    """Loads the firefox cookie jar once per process"""
+    return browser_cookie3.firefox()
+
 
 class Scraper:
 
@@ -22,43 +32,65 @@ class Scraper:
         'sec-ch-ua-platform': '"Linux"',
     }
 
-    def __init__(self, season, headers=None, cookies=None):
-        self._s = CachedSession('http_cache', backend='sqlite', use_cache_dir=True)
+    def __init__(self, season, headers=None, cookies=None, cache_name='http_cache', backend='sqlite', timeout=30):
+        # projections() writes from several threads, so let readers run
+        # alongside the writer and wait on locks instead of failing
+        self._s = CachedSession(cache_name, backend=backend, use_cache_dir=True, wal=True, busy_timeout=30000)
         self.season = season
+        self.timeout = timeout
         self.headers = headers if headers else self.HEADERS
-        self.cookies = cookies if cookies else browser_cookie3.firefox()
+        self.cookies = cookies if cookies else _firefox_cookies()
+        self._s.cookies.update(self.cookies)
+
+        # urls are fixed for the season, per-player ones only differ by player id
+        self._url_templates = {
+            'players': f'{self.base_url}players/players_ESPNFantasyFootball_{season}.json',
+            'performance': f'{self.base_url}performance/performance_%s_ESPNFantasyFootball_{season}.json',
+            'player': f'{self.base_url}players/players_%s_ESPNFantasyFootball_{season}.json',
+            'playertrend': f'{self.base_url}playertrends/playertrends_%s_ESPNFantasyFootball_{season}.json',
+            'projection': f'{self.base_url}projections/projections_%s_ESPNFantasyFootball_{season}.json',
+        }
 
     @property
     def base_url(self):
         return 'https://watsonfantasyfootball.espn.com/espnpartner/dallas/'
 
     def get(self, url):
-        return self._s.get(url).json()
+        return orjson.loads(self._s.get(url, timeout=self.timeout).content)
         
     def performance(self, player_id):
         """Gets Watson performance resource for single player"""
-        url = f'performance/performance_{player_id}_ESPNFantasyFootball_{self.season}.json'
-        return self.get(self.base_url + url)
+        return self.get(self._url_templates['performance'] % player_id)
 
     def player(self, player_id):
         """Gets single Watson player"""
-        url = f'players/players_{player_id}_ESPNFantasyFootball_{self.season}.json'
-        return self.get(self.base_url + url)
+        return self.get(self._url_templates['player'] % player_id)
 
     def players(self):
         """Gets list of all Watson players"""
-        url = 'players/players_ESPNFantasyFootball_{self.season}.json'
-        return self.get(self.base_url + url)
+        return self.get(self._url_templates['players'])
 
     def playertrend(self, player_id):
         """Gets Watson playertrend for single player"""
-        url = f'playertrends/playertrends_{player_id}_ESPNFantasyFootball_{self.season}.json'
-        return self.get(self.base_url + url)
+        return self.get(self._url_templates['playertrend'] % player_id)
 
     def projection(self, player_id):
         """Gets Watson projection for single player"""
-        url = f'projections/projections_{player_id}_ESPNFantasyFootball_{self.season}.json'
-        return self.get(self.base_url + url)
+        return self.get(self._url_templates['projection'] % player_id)
+
+    def projections(self, player_ids, max_workers=16):
+        """Gets Watson projections for multiple players concurrently
+
+        Args:
+            player_ids (iterable): the Watson player ids
+            max_workers (int): maximum number of simultaneous requests
+
+        Returns:
+            list: of projection JSON, in the same order as player_ids
+
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.projection, player_ids))
 
 
 class Parser:
@@ -71,6 +103,12 @@ class Parser:
                    'EVENT_YEAR', 'FULL_NAME', 'POSITION', 'TEAM', 'TEAM_LOCATION', 'AGE', 'HEIGHT', 'WEIGHT', 'YEARS_EXPERIENCE', 'PRO_TEAM_ID', 
                    'IS_ON_INJURED_RESERVE', 'IS_SUSPENDED', 'IS_ON_BYE', 'IS_FREE_AGENT', 'CURRENT_RANK', 'INJURY_STATUS_DATE', 'OUTSIDE_PROJECTION']
 
+    PROJECTION_KEYS = ['PLAYERID', 'DATA_TIMESTAMP', 'SCORE_PROJECTION', 'SCORE_DISTRIBUTION', 'LOW_SCORE',
+                       'HIGH_SCORE', 'OUTSIDE_PROJECTION', 'SIMULATION_PROJECTION']
+
+    _player_getter = itemgetter(*PLAYER_KEYS)
+    _projection_getter = itemgetter(*PROJECTION_KEYS)
+
     def __init__(self):
         logging.getLogger(__name__).addHandler(logging.NullHandler())
     
@@ -82,7 +120,7 @@ class Parser:
         """Parses player JSON"""
         if isinstance(data, list):
             data = data[-1]
-        return {k: data[k] for k in self.PLAYER_KEYS}
+        return dict(zip(self.PLAYER_KEYS, self._player_getter(data)))
 
     def players(self, data):
         """Parses players JSON"""
@@ -94,39 +132,76 @@ class Parser:
 
     def projection(self, data):
         """Parses projection JSON"""
-        wanted = ['PLAYERID', 'DATA_TIMESTAMP', 'SCORE_PROJECTION', 'SCORE_DISTRIBUTION', 'LOW_SCORE',
-                  'HIGH_SCORE', 'OUTSIDE_PROJECTION', 'SIMULATION_PROJECTION']
-        return {k: v for k, v in data[-1].items() if k in wanted}
+        item = data[-1]
+        try:
+            return dict(zip(self.PROJECTION_KEYS, self._projection_getter(item)))
+        except KeyError:
+            return {k: item[k] for k in self.PROJECTION_KEYS if k in item}
 
     def projection_distribution(self, data):
         '''
         Returns distribution of scores for player
 
         Returns:
-            list: of float
+            np.ndarray: of float, can be used as score_distribution in randomize_watson
 
         '''
         try:
-            return [s[0] for s in json.loads(data['SCORE_DISTRIBUTION'])]
-        except:
+            return np.asarray(orjson.loads(data['SCORE_DISTRIBUTION']), dtype=np.float64)[:, 0]
+        except Exception:
             return None
 
-    def randomize_watson(projections, percentiles=(25, 75)):
+    @staticmethod
+    def randomize_watson(projections, percentiles=(25, 75), rng=None):
         """
         Uses range of projections to optimize
 
-        """
-        def _get_proj(player):
-            # score_distribution is a list of lists
-            # can use zip with * operator to unpack
-            new_player = {k: v for k,v in player.items() if k != 'score_distribution'}  
-            scores, _ = zip(*player['score_distribution'])
-            pctfloor, pctceil = np.percentile(scores, percentiles)
-            score_range = [score for score in scores if score >= pctfloor and score <= pctceil]
-            new_player['dist'] = np.random.choice(score_range)
-            return new_player
+        Args:
+            projections (list): of dict with score_distribution key, either
+                [score, probability] pairs or an array of scores
+            percentiles (tuple): floor and ceiling percentiles of the sampled range
+            rng (np.random.Generator): optional generator, for reproducible draws
 
-        return [_get_proj(player) for player in projections]
+        Returns:
+            list: of dict with dist key instead of score_distribution
+
+        """
+        if not projections:
+            return []
+        rng = rng if rng is not None else np.random.default_rng()
+
+        # score_distribution is a list of [score, probability] pairs
+        # or an array of scores, e.g. from projection_distribution
+        dists = [
+            dist.reshape(len(dist), -1)[:, 0] if isinstance(dist, np.ndarray)
+            else np.fromiter((score for score, _ in dist), dtype=np.float64, count=len(dist))
+            for dist in (player['score_distribution'] for player in projections)
+        ]
+        flat = np.concatenate(dists)
+
+        # pad all players' scores into one sorted 2-D array, one row per player
+        lens = np.array([len(dist) for dist in dists])
+        scores = np.full((len(lens), lens.max()), np.inf)
+        scores[np.arange(scores.shape[1]) < lens[:, None]] = flat
+        scores.sort(axis=1)
+
+        # percentiles by linear interpolation, same as np.percentile
+        pos = np.multiply.outer(lens - 1, np.asarray(percentiles) / 100)
+        below = np.floor(pos).astype(int)
+        above = np.minimum(below + 1, lens[:, None] - 1)
+        low = np.take_along_axis(scores, below, axis=1)
+        high = np.take_along_axis(scores, above, axis=1)
+        pctfloor, pctceil = (low + (high - low) * (pos - below)).T
+
+        # scores in range are contiguous in each sorted row, so draw an offset
+        start = (scores < pctfloor[:, None]).sum(axis=1)
+        stop = (scores <= pctceil[:, None]).sum(axis=1)
+        sampled = scores[np.arange(len(lens)), start + rng.integers(0, stop - start)]
+
+        return [
+            {**{k: v for k, v in player.items() if k != 'score_distribution'}, 'dist': dist}
+            for player, dist in zip(projections, sampled)
+        ]
 
 
 class WatsonProjections(ProjectionSource):
@@ -147,28 +222,42 @@ class WatsonProjections(ProjectionSource):
         'SIMULATION_PROJECTION': 'simulation_projection'
     }
 
-    def __init__(self, season: int, **kwargs):
-        """Creates object"""
+    def __init__(self, season: int, cache_name='http_cache', backend='sqlite', **kwargs):
+        """Creates object
+
+        Args:
+            season (int): the season, e.g. 2021
+            cache_name (str): HTTP cache name, passed to Scraper
+            backend (str): HTTP cache backend, passed to Scraper
+
+        """
         kwargs['column_mapping'] = self.COLUMN_MAPPING
         kwargs['projections_name'] = 'watson'
         super().__init__(**kwargs)
         self.season = season
+        self.cache_name = cache_name
+        self.backend = backend
 
     def load_raw(self):
-        values = []
-        s = Scraper(season=self.season)
+        """Loads raw projections
+
+        Returns:
+            list: of dict
+
+        """
+        s = Scraper(season=self.season, cache_name=self.cache_name, backend=self.backend)
         p = Parser()
-        for item in s.players(self.season):
-            player = p.player(item)
-            proj = s.projection(player['PLAYER_ID'])           
-            values.append({**player, **proj})
-        return values
+        players = p.players(s.players())
+        projections = s.projections([player['PLAYERID'] for player in players])
+        return [{**player, **p.projection(proj)} for player, proj in zip(players, projections)]
         
     def process_raw(self, df):
         """Processes raw dataframe"""
-        df.columns = self.remap_columns(df.columns)
-        wanted = list(self.COLUMN_MAPPING.values())
-        return df.loc[:, wanted]
+        return (
+            df.rename(columns=self.COLUMN_MAPPING)
+            .reindex(columns=list(self.COLUMN_MAPPING.values()))
+            .astype({'pos': 'category', 'team': 'category', 'opp': 'category'})
+        )
 
     def standardize(self, df):
         """Standardizes names/teams/positions
@@ -199,8 +288,4 @@ class WatsonProjections(ProjectionSource):
             pd.Series
 
         """
-        # different approach for defenses
-        # different rules for defense and players
-        return np.where(df.pos == 'DST', 
-                        df.team.str.lower() + ' defense', 
-                        df.plyr.apply(nflnames.standardize_player_name))
+        return utils.standardize_players(df)
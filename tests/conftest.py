@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pathlib import Path
 import sys
 
@@ -6,6 +7,12 @@ import pytest
 sys.path.append("../espnprojections")
 
 
+@lru_cache(maxsize=None)
+def _fixture_bytes(path: str) -> bytes:
+    """Reads a fixture file once per process"""
+    return Path(path).read_bytes()
+
+
 @pytest.fixture(scope="session", autouse=True)
 def root_directory(request):
     """Gets root directory"""
@@ -18,6 +25,53 @@ def test_directory(request):
     return Path(request.config.rootdir) / "tests"
 
 
+@pytest.fixture(scope="session")
+def fixture_bytes():
+    """Gets reader of fixture file bytes, memoized by path"""
+    return _fixture_bytes
+
+
+@pytest.fixture(scope="session")
+def espn_json_text(test_directory):
+    """Gets text of espn.json, read once per session"""
+    return _fixture_bytes(str(test_directory / "espn.json")).decode()
+
+
+@pytest.fixture(scope="session")
+def performance_json_text(test_directory):
+    """Gets text of performance.json, read once per session"""
+    return _fixture_bytes(str(test_directory / "performance.json")).decode()
+
+
+@pytest.fixture(scope="session")
+def player_json_text(test_directory):
+    """Gets text of player.json, read once per session"""
+    return _fixture_bytes(str(test_directory / "player.json")).decode()
+
+
+@pytest.fixture(scope="session")
+def players_json_text(test_directory):
+    """Gets text of players.json, read once per session"""
+    return _fixture_bytes(str(test_directory / "players.json")).decode()
+
+
+@pytest.fixture(scope="session")
+def playertrend_json_text(test_directory):
+    """Gets text of playertrend.json, read once per session"""
+    return _fixture_bytes(str(test_directory / "playertrend.json")).decode()
+
+
+@pytest.fixture(scope="session")
+def projection_json_text(test_directory):
+    """Gets text of projection.json, read once per session"""
+    return _fixture_bytes(str(test_directory / "projection.json")).decode()
+
+
+@pytest.fixture(scope="session")
+def http_cache():
+    """Gets Scraper cache arguments that keep test responses out of the user's HTTP cache"""
+    return {"backend": "memory"}
+
 
 @pytest.fixture()
 def tprint(request, capsys):
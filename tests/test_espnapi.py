@@ -1,74 +1,116 @@
 # -*- coding: utf-8 -*-
-from functools import lru_cache
-import json
-
+import orjson
 import pandas as pd
 import pytest
-import requests_mock
+from requests_mock import ANY, Mocker
 
 from espnprojections.espnapi import Scraper, Parser, ESPNProjections
 
 
 SEASON = 2021
 
-@lru_cache
-@pytest.fixture
-def content(test_directory):
-    return json.loads((test_directory / 'espn.json').read_text())
+@pytest.fixture(scope="session")
+def content(test_directory, fixture_bytes):
+    return orjson.loads(fixture_bytes(str(test_directory / 'espn.json')))
+
+
+@pytest.fixture(scope="module")
+def espn_raw_df(test_directory, espn_json_text, http_cache):
+    """ESPNProjections and its load_raw result, shared by the module"""
+    with Mocker() as mock:
+        mock.get(ANY, text=espn_json_text)
+        ep = ESPNProjections(rawdir=test_directory, procdir=test_directory, **http_cache)
+        return ep, ep.load_raw(season=SEASON, week=0)
 
 
-def test_scraper():
-    assert Scraper(SEASON)
+def test_scraper(http_cache):
+    assert Scraper(SEASON, **http_cache)
 
 
 def test_parser():
     assert Parser(SEASON, 0)
 
 
-@requests_mock.Mocker(kw='mock')
-def test_season_projections(test_directory, tprint, **kwargs):
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'espn.json').read_text())
-    s = Scraper(SEASON)
+def test_scraper_projections(requests_mock, content, espn_json_text, http_cache):
+    requests_mock.get(ANY, text=espn_json_text)
+    s = Scraper(SEASON, **http_cache)
+    assert s.projections() == content
+
+
+def test_scraper_cache(requests_mock, espn_json_text, http_cache):
+    requests_mock.get(ANY, text=espn_json_text)
+    s = Scraper(SEASON, **http_cache)
+    s.projections()
+    s.projections()
+    assert requests_mock.call_count == 1
+    s.refresh()
+    s.projections()
+    assert requests_mock.call_count == 2
+
+
+def test_season_projections(content):
     p = Parser(season=SEASON, week=0)
-    proj = p.projections(s.projections())
+    proj = p.projections(content)
     assert isinstance(proj, list)
     assert isinstance(proj[0], dict)
 
 
-def test_espn_projections_source(test_directory):
+def test_stream_projections(requests_mock, content, espn_json_text, http_cache):
+    requests_mock.get(ANY, text=espn_json_text)
+    s = Scraper(SEASON, **http_cache)
+    p = Parser(season=SEASON, week=0)
+    with s.projections_stream() as r:
+        proj = p.stream_projections(r)
+    assert isinstance(proj, pd.DataFrame)
+    pd.testing.assert_frame_equal(proj, p.weekly_projections(content))
+
+
+def test_stream_projections_cached(requests_mock, espn_json_text, http_cache):
+    requests_mock.get(ANY, text=espn_json_text)
+    s = Scraper(SEASON, **http_cache)
+    p = Parser(season=SEASON, week=0)
+    with s.projections_stream() as r:
+        first = p.stream_projections(r)
+    with s.projections_stream() as r:
+        assert r.from_cache
+        second = p.stream_projections(r)
+    assert requests_mock.call_count == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_espn_projections_source(test_directory, http_cache):
     """Tests ESPNProjections"""
-    ep = ESPNProjections(rawdir=test_directory, procdir=test_directory)
+    ep = ESPNProjections(rawdir=test_directory, procdir=test_directory, **http_cache)
     assert ep is not None
 
 
-@requests_mock.Mocker(kw='mock')
-def test_espn_projections_source_load_raw(test_directory, tprint, **kwargs):
+def test_espn_projections_source_load_raw(espn_raw_df, tprint):
     """Tests ESPNProjections"""
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'espn.json').read_text())
-    ep = ESPNProjections(rawdir=test_directory, procdir=test_directory)
-    proj = ep.load_raw(season=SEASON, week=0)
+    _, proj = espn_raw_df
     assert isinstance(proj, pd.DataFrame)
     tprint(proj.columns)
 
 
-@requests_mock.Mocker(kw='mock')
-def test_espn_projections_source_process_raw(test_directory, tprint, **kwargs):
+def test_espn_projections_source_process_raw(espn_raw_df):
     """Tests ESPNProjections process raw"""
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'espn.json').read_text())
-    ep = ESPNProjections(rawdir=test_directory, procdir=test_directory)
-    proj = ep.load_raw(season=SEASON, week=0)
+    ep, proj = espn_raw_df
     df = ep.process_raw(proj)
     assert isinstance(df, pd.DataFrame)
     assert 'plyr' in df.columns
 
 
-@requests_mock.Mocker(kw='mock')
-def test_espn_projections_source_standardize(test_directory, tprint, **kwargs):
+def test_espn_projections_source_standardize(espn_raw_df):
     """Tests ESPNProjections standardize"""
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'espn.json').read_text())
-    ep = ESPNProjections(rawdir=test_directory, procdir=test_directory)
-    proj = ep.load_raw(season=SEASON, week=0)
+    ep, proj = espn_raw_df
     df = ep.process_raw(proj)
     df = ep.standardize(df)
     assert isinstance(df, pd.DataFrame)
     assert 'plyr' in df.columns
+
+
+def test_espn_projections_source_standardize_plain_team(espn_raw_df):
+    """Tests ESPNProjections standardize when team is not categorical"""
+    ep, proj = espn_raw_df
+    df = ep.process_raw(proj).astype({'team': object})
+    df = ep.standardize(df)
+    assert 'WSH' not in set(df.team)
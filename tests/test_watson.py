@@ -1,73 +1,127 @@
 # -*- coding: utf-8 -*-
-from functools import lru_cache
+from contextlib import closing
 import json
-import random
+import re
+import sqlite3
 
-import pandas as pd
+import numpy as np
+import orjson
 import pytest
-import requests_mock
 
 from espnprojections.watson import Scraper, Parser, WatsonProjections
 
 
 SEASON = 2021
 
-def test_scraper():
-    assert Scraper(SEASON)
+@pytest.fixture
+def watson_mock(requests_mock, performance_json_text, player_json_text, players_json_text,
+                playertrend_json_text, projection_json_text):
+    """Mocks each Watson endpoint with its fixture"""
+    requests_mock.get(re.compile(r'/performance_'), text=performance_json_text)
+    requests_mock.get(re.compile(r'/players_-?\d+_'), text=player_json_text)
+    requests_mock.get(re.compile(r'/players_ESPNFantasyFootball_'), text=players_json_text)
+    requests_mock.get(re.compile(r'/playertrends_'), text=playertrend_json_text)
+    requests_mock.get(re.compile(r'/projections_'), text=projection_json_text)
+    return requests_mock
+
+
+@pytest.fixture
+def sp(http_cache):
+    """Scraper with an empty cache and Parser, built per test since the cookie jar is cached"""
+    return Scraper(SEASON, **http_cache), Parser()
+
+
+def test_scraper(http_cache):
+    assert Scraper(SEASON, **http_cache)
 
 
 def test_parser():
     assert Parser()
 
 
-@requests_mock.Mocker(kw='mock')
-def test_projection(test_directory, tprint, **kwargs):
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'projection.json').read_text())
-    s = Scraper(SEASON)
-    p = Parser()
-    proj = p.projection(s.projection(1))
-    assert isinstance(proj, dict)
-    tprint(proj)
+@pytest.mark.parametrize('method,args,expected_type', [
+    ('projection', (1,), dict),
+    ('player', (1,), dict),
+    ('players', (), list),
+    ('playertrend', (1,), list),
+    ('performance', (1,), list),
+])
+def test_scrape_and_parse(sp, watson_mock, tprint, method, args, expected_type):
+    s, p = sp
+    data = getattr(p, method)(getattr(s, method)(*args))
+    assert isinstance(data, expected_type)
+    if expected_type is list:
+        assert data and isinstance(data[0], dict)
+    tprint(data)
 
 
-@requests_mock.Mocker(kw='mock')
-def test_player(test_directory, tprint, **kwargs):
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'player.json').read_text())
-    s = Scraper(SEASON)
-    p = Parser()
-    data = p.player(s.player(1))
-    assert isinstance(data, dict)
-    tprint(data)
+def test_players_url(watson_mock, http_cache):
+    Scraper(SEASON, **http_cache).players()
+    assert watson_mock.last_request.url.endswith(f'players_ESPNFantasyFootball_{SEASON}.json')
 
 
-@requests_mock.Mocker(kw='mock')
-def test_players(test_directory, tprint, **kwargs):
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'players.json').read_text())
-    s = Scraper(SEASON)
-    p = Parser()
-    data = p.players(s.players())
-    assert isinstance(data, list)
-    assert isinstance(random.choice(data), dict)
-    tprint(data)
+def test_scraper_timeout(watson_mock, http_cache):
+    Scraper(SEASON, timeout=5, **http_cache).player(1)
+    assert watson_mock.last_request.timeout == 5
 
 
-@requests_mock.Mocker(kw='mock')
-def test_playertrend(test_directory, tprint, **kwargs):
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'playertrend.json').read_text())
-    s = Scraper(SEASON)
+def test_projection_distribution(projection_json_text):
     p = Parser()
-    data = p.playertrend(s.playertrend(1))
-    assert isinstance(data, list)
-    assert isinstance(random.choice(data), dict)
+    proj = p.projection(orjson.loads(projection_json_text))
+    dist = p.projection_distribution(proj)
+    assert isinstance(dist, np.ndarray)
+    assert dist.tolist() == [score for score, _ in json.loads(proj['SCORE_DISTRIBUTION'])]
+    assert p.projection_distribution({}) is None
+
+
+def test_projections(sp, watson_mock, tprint):
+    s, p = sp
+    data = [p.projection(item) for item in s.projections([1, 2, 3])]
+    assert len(data) == 3
+    assert isinstance(data[0], dict)
     tprint(data)
 
 
-@requests_mock.Mocker(kw='mock')
-def test_performance(test_directory, tprint, **kwargs):
-    kwargs['mock'].get(requests_mock.ANY, text=(test_directory / 'performance.json').read_text())
-    s = Scraper(SEASON)
-    p = Parser()
-    data = p.performance(s.performance(1))
-    assert isinstance(data, list)
-    assert isinstance(random.choice(data), dict)
-    tprint(data)
+def test_watson_projections_load_raw(watson_mock, tmp_path, players_json_text, projection_json_text):
+    # enough players to keep every worker thread busy, with one small projection each
+    players = orjson.loads(players_json_text)[:100]
+    last = orjson.loads(projection_json_text)[-1:]
+    watson_mock.get(re.compile(r'/players_ESPNFantasyFootball_'), content=orjson.dumps(players))
+    watson_mock.get(re.compile(r'/projections_'), content=orjson.dumps(last))
+    cache = tmp_path / 'http_cache'
+    wp = WatsonProjections(season=SEASON, rawdir=tmp_path, procdir=tmp_path, cache_name=str(cache))
+    data = wp.load_raw()
+    assert len(data) == len(players)
+    assert data[0]['SCORE_PROJECTION'] == last[-1]['SCORE_PROJECTION']
+
+    # lock contention needs multi-MB responses, so check the cache allows concurrent readers
+    with closing(sqlite3.connect(cache.with_suffix('.sqlite'))) as con:
+        assert con.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_randomize_watson(projection_json_text):
+    data = orjson.loads(projection_json_text)
+    players = [{'PLAYERID': item['PLAYERID'], 'score_distribution': orjson.loads(item['SCORE_DISTRIBUTION'])}
+               for item in data]
+    randomized = Parser.randomize_watson(players, rng=np.random.default_rng(0))
+    assert len(randomized) == len(players)
+    for player, item in zip(players, randomized):
+        scores = [score for score, _ in player['score_distribution']]
+        pctfloor, pctceil = np.percentile(scores, (25, 75))
+        assert 'score_distribution' not in item
+        assert pctfloor <= item['dist'] <= pctceil
+
+
+def test_randomize_watson_empty():
+    assert Parser.randomize_watson([]) == []
+
+
+def test_randomize_watson_arrays(projection_json_text):
+    data = orjson.loads(projection_json_text)
+    pairs = [{'score_distribution': orjson.loads(item['SCORE_DISTRIBUTION'])} for item in data]
+    arrays = [{'score_distribution': np.array([score for score, _ in player['score_distribution']])}
+              for player in pairs]
+    mixed = [array if i % 2 else pair for i, (pair, array) in enumerate(zip(pairs, arrays))]
+    randomized = Parser.randomize_watson(pairs, rng=np.random.default_rng(0))
+    assert randomized == Parser.randomize_watson(arrays, rng=np.random.default_rng(0))
+    assert randomized == Parser.randomize_watson(mixed, rng=np.random.default_rng(0))